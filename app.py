@@ -2,12 +2,16 @@ import re
 from io import BytesIO
 from urllib.parse import urlparse, parse_qs
 import html
+import gc
 import hashlib
+import json
 import zipfile
+import threading
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
 
 import streamlit as st
 from openpyxl import load_workbook
-from openpyxl.utils import get_column_letter
 import requests
 
 
@@ -23,6 +27,11 @@ def normalize_header(value: str) -> str:
     return str(value).strip().replace("\u00A0", " ")  # non-breaking space 제거
 
 
+# 셀 URL 추출 패턴 (엑셀 행마다 호출되므로 모듈 로드 시 1회만 컴파일)
+_HYPERLINK_FORMULA_RE = re.compile(r'HYPERLINK\(("|\')(.*?)("|\')', re.IGNORECASE)
+_URL_TEXT_RE = re.compile(r"https?://[^\s)\]\"']+")
+
+
 def extract_url_from_cell(cell) -> tuple[str | None, str | None]:
     """셀에서 URL을 추출하고, 추출 방식(source)을 함께 반환한다.
     우선순위: 실제 하이퍼링크 → HYPERLINK 수식 → 본문 내 URL 텍스트
@@ -38,7 +47,7 @@ def extract_url_from_cell(cell) -> tuple[str | None, str | None]:
     try:
         if isinstance(cell.value, str) and cell.value.startswith("=") and "HYPERLINK" in cell.value.upper():
             # 첫 번째 인자로 오는 URL 추출 (따옴표로 둘러싸인 부분)
-            m = re.search(r'HYPERLINK\(("|\')(.*?)("|\')', cell.value, re.IGNORECASE)
+            m = _HYPERLINK_FORMULA_RE.search(cell.value)
             if m:
                 return m.group(2), "formula"
     except Exception:
@@ -47,7 +56,7 @@ def extract_url_from_cell(cell) -> tuple[str | None, str | None]:
     # 3) 일반 텍스트에 URL 포함
     try:
         if isinstance(cell.value, str):
-            m = re.search(r"https?://[^\s)\]\"']+", cell.value)
+            m = _URL_TEXT_RE.search(cell.value)
             if m:
                 return m.group(0), "text"
     except Exception:
@@ -56,77 +65,190 @@ def extract_url_from_cell(cell) -> tuple[str | None, str | None]:
     return None, None
 
 
+# 이미지/링크 경로 보정 패턴
+_PARENT_REL_URL_RE = re.compile(r'(src|href)=[\"\']\.\./([^\"\']+)[\"\']')
+_PROTOCOL_REL_URL_RE = re.compile(r'(src|href)=[\"\']//')
+
+
 def _absolutize_urls(html: str, base: str = "https://sd.wips.co.kr/wipslink/") -> str:
     if not html:
         return html
     # ../path -> absolute
-    html = re.sub(r'(src|href)=[\"\']\.\./([^\"\']+)[\"\']', rf"\\1=\"{base}\\2\"", html)
+    html = _PARENT_REL_URL_RE.sub(rf"\\1=\"{base}\\2\"", html)
     # //img4.wipson.com -> https://img4.wipson.com
-    html = re.sub(r'(src|href)=[\"\']//', r"\\1=\"https://", html)
+    html = _PROTOCOL_REL_URL_RE.sub(r"\\1=\"https://", html)
     return html
 
 
+# 본문 태그 정규화 테이블 (호출마다 재생성하지 않도록 모듈 상수로 유지)
+_DESCRIPTION_TAG_REPLACEMENTS = (
+    ("<invention-title>", "<h3>"),
+    ("</invention-title>", "</h3>"),
+    ("<technical-field>", "<div id=\"technical-field\">"),
+    ("</technical-field>", "</div>"),
+    ("<background-art>", "<div id=\"background-art\">"),
+    ("</background-art>", "</div>"),
+    ("<summary-of-invention>", "<div id=\"summary-of-invention\">"),
+    ("</summary-of-invention>", "</div>"),
+    ("<description-of-drawings>", "<div id=\"description-of-drawings\">"),
+    ("</description-of-drawings>", "</div>"),
+    ("<description-of-embodiments>", "<div id=\"description-of-embodiments\">"),
+    ("</description-of-embodiments>", "</div>"),
+    ("<citation-list>", "<div id=\"citation-list\">"),
+    ("</citation-list>", "</div>"),
+    ("<embodiments-example>", "<div id=\"embodiments-example\">"),
+    ("</embodiments-example>", "</div>"),
+)
+# 속성이 붙은 <p ...> 태그
+_P_WITH_ATTRS_RE = re.compile(r"<p\s+[^>]*>", re.IGNORECASE)
+
+
 def _normalize_description_html(raw_html: str) -> str:
     if not raw_html:
         return ""
     html = raw_html
     # 간단 태그 정규화
-    replacements = [
-        ("<invention-title>", "<h3>"),
-        ("</invention-title>", "</h3>"),
-        ("<technical-field>", "<div id=\"technical-field\">"),
-        ("</technical-field>", "</div>"),
-        ("<background-art>", "<div id=\"background-art\">"),
-        ("</background-art>", "</div>"),
-        ("<summary-of-invention>", "<div id=\"summary-of-invention\">"),
-        ("</summary-of-invention>", "</div>"),
-        ("<description-of-drawings>", "<div id=\"description-of-drawings\">"),
-        ("</description-of-drawings>", "</div>"),
-        ("<description-of-embodiments>", "<div id=\"description-of-embodiments\">"),
-        ("</description-of-embodiments>", "</div>"),
-        ("<citation-list>", "<div id=\"citation-list\">"),
-        ("</citation-list>", "</div>"),
-        ("<embodiments-example>", "<div id=\"embodiments-example\">"),
-        ("</embodiments-example>", "</div>"),
-    ]
-    for src, dst in replacements:
+    for src, dst in _DESCRIPTION_TAG_REPLACEMENTS:
         html = html.replace(src, dst)
     # p 태그 단순화
-    html = re.sub(r"<p\s+[^>]*>", "<p>", html, flags=re.IGNORECASE)
+    html = _P_WITH_ATTRS_RE.sub("<p>", html)
     # 이미지/링크 절대경로화
     html = _absolutize_urls(html)
     return html
 
 
-def fetch_wips_description(target_url: str) -> dict:
-    """WIPS 상세보기 URL에서 발명의 설명(DS) 전체를 언어별로 수집한다.
-    반환: { 'doc': {...meta}, 'descriptions': {langCd: html}, 'order': [lang list] }
+# 상세보기 경로 토큰 → 국가 코드 (여러 토큰이 있으면 이 순서가 우선)
+_DS_PATH_CTRY = {
+    "dkrdshtm": "KR",
+    "dusdshtm": "US",
+    "dwodshtm": "WO",
+    "djpdshtm": "JP",
+    "depdshtm": "EP",
+    "dcndshtm": "CN",
+}
+
+
+def _infer_ctry_from_path(path: str) -> str | None:
+    path = path or ""
+    return next((c for tok, c in _DS_PATH_CTRY.items() if tok in path), None)
+
+
+# 상세보기 페이지 메타 패턴
+_HIDDEN_INPUT_RE = re.compile(r'id="(skey|ctry)"\s+value="([^"]*)"')
+_HIDDEN_INPUT_VALUE_RES = {"skey": re.compile(r"\d+"), "ctry": re.compile(r"[A-Z]{2}")}
+_NATION_CODETEXT_RE = re.compile(r'<p\s+class="nation_codetext">\s*([^<]+)\s*</p>')
+
+
+def _scan_hidden_inputs(html: str) -> dict[str, str]:
+    """페이지 HTML을 한 번만 훑어 skey/ctry hidden 값을 함께 찾는다. 둘 다 찾으면 즉시 종료."""
+    found: dict[str, str] = {}
+    for m in _HIDDEN_INPUT_RE.finditer(html):
+        name, value = m.group(1), m.group(2)
+        if name in found or not _HIDDEN_INPUT_VALUE_RES[name].fullmatch(value):
+            continue
+        found[name] = value
+        if len(found) == len(_HIDDEN_INPUT_VALUE_RES):
+            break
+    return found
+
+
+_BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124 Safari/537.36",
+    "Accept-Language": "ko,en;q=0.9",
+}
+
+
+# 상세보기 탭 본문(JSON) 엔드포인트
+_DOC_CONT_URL = "https://sd.wips.co.kr/wipslink/doc/docContJson.wips"
+
+
+def _ajax_headers(referer: str) -> dict[str, str]:
+    """docContJson.wips 호출용 AJAX 헤더 (브라우저 헤더 + Referer)."""
+    return {
+        **_BROWSER_HEADERS,
+        "Referer": referer,
+        "X-Requested-With": "XMLHttpRequest",
+        "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8; metatype=json",
+    }
+
+
+# 원문 수집 워커 스레드별 세션 (같은 호스트로의 keep-alive 연결을 문서 간에 재사용)
+_worker_local = threading.local()
+
+
+def _init_fetch_worker(sessions: list[requests.Session]) -> None:
+    """ThreadPoolExecutor initializer: 워커 스레드마다 세션을 1개씩 만들어 둔다.
+    만든 세션은 sessions에도 넣어 두어, 풀 종료 후 호출 측에서 닫을 수 있게 한다.
     """
     session = requests.Session()
     session.verify = False
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124 Safari/537.36",
-        "Accept-Language": "ko,en;q=0.9",
-    }
-    r = session.get(target_url, headers=headers, timeout=20)
-    r.raise_for_status()
+    _worker_local.session = session
+    sessions.append(session)
 
-    # skey 우선 URL 쿼리에서
-    parsed = urlparse(target_url)
-    qs = parse_qs(parsed.query)
-    skey = qs.get("skey", [None])[0]
-    # ctry 및 폼 hidden 값 보완
+
+def _open_detail_page(target_url: str) -> tuple[requests.Session, str, str | None, str]:
+    """상세보기 페이지를 요청해 (세션, html, skey, ctry)를 반환한다.
+    skey는 URL 쿼리 → 폼 hidden 값 순으로, ctry는 hidden 값(없으면 WO)으로 채운다.
+    """
+    session = getattr(_worker_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        session.verify = False
+    else:
+        # 연결 풀만 재사용하고, 쿠키는 문서마다 새 세션과 같도록 비운다
+        session.cookies.clear()
+    r = session.get(target_url, headers=_BROWSER_HEADERS, timeout=20)
+    r.raise_for_status()
     html = r.text
+
+    # skey 우선 URL 쿼리에서, ctry 및 폼 hidden 값 보완
+    skey = parse_qs(urlparse(target_url).query).get("skey", [None])[0]
+    hidden = _scan_hidden_inputs(html)
     if not skey:
-        m = re.search(r'id="skey"\s+value=\"(\d+)\"', html)
-        if m:
-            skey = m.group(1)
-    m_ctry = re.search(r'id=\"ctry\"\s+value=\"([A-Z]{2})\"', html)
-    ctry = m_ctry.group(1) if m_ctry else "WO"
+        skey = hidden.get("skey")
+    ctry = hidden.get("ctry") or "WO"
+    return session, html, skey, ctry
+
+
+# 언어 추정용 문자 구간 패턴 (연속 구간 단위로 매칭해 치환 횟수를 줄인다)
+_KOR_CHARS_RE = re.compile(r"[\uac00-\ud7af]+")
+_JPN_CHARS_RE = re.compile(r"[\u3040-\u30ff]+")
+_HAN_CHARS_RE = re.compile(r"[\u4e00-\u9fff]+")
+_LAT_CHARS_RE = re.compile(r"[A-Za-z]+")
+
+
+def _count_chars(pattern: re.Pattern, text: str) -> int:
+    """pattern에 해당하는 문자 수. findall처럼 문자마다 리스트 원소를 만들지 않고 길이 차이로 센다."""
+    return len(text) - len(pattern.sub("", text))
+
+
+def _guess_lang(raw_html: str) -> str:
+    """langCd가 비어 있는 본문의 언어를 문자 분포로 추정한다."""
+    if not raw_html:
+        return "US"
+    kor = _count_chars(_KOR_CHARS_RE, raw_html)
+    jpn = _count_chars(_JPN_CHARS_RE, raw_html)
+    han = _count_chars(_HAN_CHARS_RE, raw_html)
+    lat = _count_chars(_LAT_CHARS_RE, raw_html)
+    total = max(kor + jpn + han + lat, 1)
+    if kor / total > 0.2:
+        return "KR"
+    if jpn / total > 0.2:
+        return "JP"
+    if han / total > 0.4 and kor == 0 and jpn == 0:
+        return "CN"
+    return "US"
+
+
+def fetch_wips_description(target_url: str) -> dict:
+    """WIPS 상세보기 URL에서 발명의 설명(DS) 전체를 언어별로 수집한다.
+    반환: { 'doc': {...meta}, 'descriptions': {langCd: html}, 'order': [lang list] }
+    """
+    session, html, skey, ctry = _open_detail_page(target_url)
+    parsed = urlparse(target_url)
     if not skey:
         raise RuntimeError("skey를 페이지에서 찾지 못했습니다.")
 
-    post_url = "https://sd.wips.co.kr/wipslink/doc/docContJson.wips"
     data = {
         "skey": skey,
         "tabGb": "DS",
@@ -140,13 +262,8 @@ def fetch_wips_description(target_url: str) -> dict:
         "devDocType": "DS",
         "devDocCtry": ctry,
     }
-    ajax_headers = {
-        **headers,
-        "Referer": target_url,
-        "X-Requested-With": "XMLHttpRequest",
-        "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8; metatype=json",
-    }
-    j = session.post(post_url, headers=ajax_headers, data=data, timeout=30)
+    ajax_headers = _ajax_headers(target_url)
+    j = session.post(_DOC_CONT_URL, headers=ajax_headers, data=data, timeout=30)
     j.raise_for_status()
     payload = j.json()
 
@@ -154,27 +271,12 @@ def fetch_wips_description(target_url: str) -> dict:
     doc = payload.get("docPageCmmRsltVO") or {}
     cfg = payload.get("docPageConfigVO") or {}
 
-    def infer_ctry_from_url(path: str) -> str | None:
-        if "dkrdshtm" in path:
-            return "KR"
-        if "dusdshtm" in path:
-            return "US"
-        if "dwodshtm" in path:
-            return "WO"
-        if "djpdshtm" in path:
-            return "JP"
-        if "depdshtm" in path:
-            return "EP"
-        if "dcndshtm" in path:
-            return "CN"
-        return None
-
-    meta_ctry = doc.get("ctry") or cfg.get("devDocCtry") or ctry or infer_ctry_from_url(parsed.path) or ""
+    meta_ctry = doc.get("ctry") or cfg.get("devDocCtry") or ctry or _infer_ctry_from_path(parsed.path) or ""
     nation_code = doc.get("nationCode") or meta_ctry
     composed = " ".join(x for x in [nation_code, doc.get("mngNum"), doc.get("docKind")] if x)
     nation_text = doc.get("nationCodetext") or composed.strip()
     if not nation_text:
-        m2 = re.search(r'<p\s+class=\"nation_codetext\">\s*([^<]+)\s*</p>', html)
+        m2 = _NATION_CODETEXT_RE.search(html)
         if m2:
             nation_text = m2.group(1).strip()
 
@@ -182,22 +284,6 @@ def fetch_wips_description(target_url: str) -> dict:
     descs = {}
     order = []
 
-    def guess_lang(raw_html: str) -> str:
-        if not raw_html:
-            return "US"
-        kor = len(re.findall(r"[\uac00-\ud7af]", raw_html))
-        jpn = len(re.findall(r"[\u3040-\u30ff]", raw_html))
-        han = len(re.findall(r"[\u4e00-\u9fff]", raw_html))
-        lat = len(re.findall(r"[A-Za-z]", raw_html))
-        total = max(kor + jpn + han + lat, 1)
-        if kor / total > 0.2:
-            return "KR"
-        if jpn / total > 0.2:
-            return "JP"
-        if han / total > 0.4 and kor == 0 and jpn == 0:
-            return "CN"
-        return "US"
-
     # 언어별 원문/번역을 분리 저장
     descs_by_lang: dict[str, dict[str, list[str]]] = {}
 
@@ -210,8 +296,7 @@ def fetch_wips_description(target_url: str) -> dict:
         raw_lang = (item.get("langCd") or "").upper()
         html_part_raw = item.get("dtlDesc") or ""
         html_part = _normalize_description_html(html_part_raw)
-        html_part = _absolutize_urls(html_part)
-        lang = (raw_lang or guess_lang(html_part_raw) or "UNK").upper()
+        lang = (raw_lang or _guess_lang(html_part_raw) or "UNK").upper()
         add_desc(lang, "origin", html_part)
         if lang not in descs:
             descs[lang] = html_part
@@ -222,8 +307,7 @@ def fetch_wips_description(target_url: str) -> dict:
         raw_lang = (item.get("langCd") or "").upper()
         html_part_raw = item.get("dtlDesc") or ""
         html_part = _normalize_description_html(html_part_raw)
-        html_part = _absolutize_urls(html_part)
-        lang = (raw_lang or guess_lang(html_part_raw) or "TRNS").upper()
+        lang = (raw_lang or _guess_lang(html_part_raw) or "TRNS").upper()
         add_desc(lang, "translation", html_part)
         if lang not in descs and lang not in order:
             descs[lang] = html_part
@@ -243,22 +327,31 @@ def fetch_wips_description(target_url: str) -> dict:
     return {"doc": doc, "descriptions": descs, "order": order, "descriptions_by_lang": descs_by_lang}
 
 
+# 태그 제거 패턴 (모듈 로드 시 1회만 컴파일)
+_SCRIPT_RE = re.compile(r"<script[\s\S]*?</script>", re.IGNORECASE)
+_STYLE_RE = re.compile(r"<style[\s\S]*?</style>", re.IGNORECASE)
+_BLOCK_TAG_RE = re.compile(r"<(br|p|li|tr|div)(\s+[^>]*)?>", re.IGNORECASE)
+_ANY_TAG_RE = re.compile(r"<[^>]+>")
+
+
 def _strip_tags(html: str) -> str:
     if not html:
         return ""
     # script/style 제거
-    html = re.sub(r"<script[\s\S]*?</script>", " ", html, flags=re.IGNORECASE)
-    html = re.sub(r"<style[\s\S]*?</style>", " ", html, flags=re.IGNORECASE)
+    html = _SCRIPT_RE.sub(" ", html)
+    html = _STYLE_RE.sub(" ", html)
     # 줄바꿈 유도 태그를 개행으로 변환
-    html = re.sub(r"<(br|p|li|tr|div)(\s+[^>]*)?>", "\n", html, flags=re.IGNORECASE)
+    html = _BLOCK_TAG_RE.sub("\n", html)
     # 기타 태그 제거
-    text = re.sub(r"<[^>]+>", " ", html)
+    text = _ANY_TAG_RE.sub(" ", html)
     # HTML 엔티티 간단 치환
     text = text.replace("&nbsp;", " ").replace("&amp;", "&").replace("&lt;", "<").replace("&gt;", ">")
-    # 공백 정리
-    text = re.sub(r"\s+", " ", text)
-    text = re.sub(r"\n+", "\n", text)
-    return text.strip()
+    # 공백 정리 (연속 공백/개행 → 공백 1개)
+    return " ".join(text.split())
+
+
+# 본문 언어 우선순위
+_PREFERRED_DESC_LANGS = ("KR", "EN", "US")
 
 
 def _select_preferred_lang_text(descriptions_by_lang: dict) -> tuple[str, str]:
@@ -269,21 +362,21 @@ def _select_preferred_lang_text(descriptions_by_lang: dict) -> tuple[str, str]:
     if not descriptions_by_lang:
         return "", ""
 
-    # KR 우선, 다음 EN/US, 이후 임의 첫 언어
-    preferred_langs = ["KR", "EN", "US"]
-    for lang in preferred_langs:
-        if lang in descriptions_by_lang:
-            bucket = descriptions_by_lang.get(lang, {"origin": [], "translation": []})
-            htmls = (bucket.get("origin", []) or []) + (bucket.get("translation", []) or [])
-            text = _strip_tags("\n".join(htmls))
-            return text, lang
-
-    # 위 우선순위에 없으면, 첫 번째 키 사용
-    first_lang = next(iter(descriptions_by_lang.keys()))
-    bucket = descriptions_by_lang.get(first_lang, {"origin": [], "translation": []})
+    # KR 우선, 다음 EN/US, 위 우선순위에 없으면 첫 번째 키 사용
+    lang = next((code for code in _PREFERRED_DESC_LANGS if code in descriptions_by_lang), None)
+    if lang is None:
+        lang = next(iter(descriptions_by_lang))
+    bucket = descriptions_by_lang[lang]
     htmls = (bucket.get("origin", []) or []) + (bucket.get("translation", []) or [])
     text = _strip_tags("\n".join(htmls))
-    return text, first_lang
+    return text, lang
+
+
+# 본문 정규화/청크화 패턴 (문서·청크마다 호출되므로 모듈 로드 시 1회만 컴파일)
+_EXCESS_NEWLINES_RE = re.compile(r"\n{3,}")
+_MULTI_SPACE_RE = re.compile(r"[ \f\v]{2,}")
+_PARA_NUM_RE = re.compile(r"\[(\d{4})\]")
+_WORD_RE = re.compile(r"\w+")
 
 
 def _decode_entities_and_normalize(text: str) -> str:
@@ -295,17 +388,17 @@ def _decode_entities_and_normalize(text: str) -> str:
     # 줄바꿈 정리 및 공백 정규화
     out = out.replace("\r\n", "\n").replace("\r", "\n")
     # 3개 이상 연속 개행 → 2개로 축소
-    out = re.sub(r"\n{3,}", "\n\n", out)
+    out = _EXCESS_NEWLINES_RE.sub("\n\n", out)
     # 탭을 공백으로 치환 후 다중 공백 축소(개행은 유지)
     out = out.replace("\t", " ")
-    out = re.sub(r"[ \f\v]{2,}", " ", out)
+    out = _MULTI_SPACE_RE.sub(" ", out)
     return out.strip()
 
 
 def _extract_section_hint(text: str) -> str | None:
     if not text:
         return None
-    nums = [int(m) for m in re.findall(r"\[(\d{4})\]", text)]
+    nums = [int(m) for m in _PARA_NUM_RE.findall(text)]
     if not nums:
         return None
     return f"[{min(nums):04d}]-[{max(nums):04d}]"
@@ -318,22 +411,15 @@ def _split_by_paragraph_numbers(text: str) -> list[tuple[str, str]]:
     if not text:
         return []
 
-    # [0001], [0002] 형태의 문단 번호로 분리
-    pattern = r'(\[\d{4}\])'
-    parts = re.split(pattern, text)
-
     paragraphs = []
     current_num = None
 
-    for i, part in enumerate(parts):
+    def add_part(part: str):
+        nonlocal current_num
         part = part.strip()
         if not part:
-            continue
-
-        # 문단 번호인지 확인
-        if re.match(r'^\[\d{4}\]$', part):
-            current_num = part
-        elif current_num:
+            return
+        if current_num:
             # 문단 번호 다음에 오는 내용
             paragraphs.append((current_num, part))
             current_num = None
@@ -341,6 +427,14 @@ def _split_by_paragraph_numbers(text: str) -> list[tuple[str, str]]:
             # 문단 번호 없이 시작하는 텍스트 (제목 등)
             paragraphs.append(("", part))
 
+    # [0001], [0002] 형태의 문단 번호 위치를 순회하며 사이 구간을 바로 잘라낸다 (분할 리스트 미생성)
+    pos = 0
+    for m in _PARA_NUM_RE.finditer(text):
+        add_part(text[pos:m.start()])
+        current_num = m.group(0)
+        pos = m.end()
+    add_part(text[pos:])
+
     return paragraphs
 
 
@@ -372,15 +466,16 @@ def _chunk_text_with_overlap(text: str, target_chars: int = 4000, overlap_chars:
             # 청크 완성
             chunks.append("\n".join(current_chunk))
 
-            # 오버랩을 위해 마지막 몇 개 문단 유지
+            # 오버랩을 위해 마지막 몇 개 문단 유지 (뒤에서부터 append 후 한 번에 뒤집어 insert(0) 반복을 피함)
             overlap_paras = []
             overlap_size = 0
             for p in reversed(current_chunk):
-                if overlap_size + len(p) <= overlap_chars:
-                    overlap_paras.insert(0, p)
-                    overlap_size += len(p)
-                else:
+                p_len = len(p)
+                if overlap_size + p_len > overlap_chars:
                     break
+                overlap_paras.append(p)
+                overlap_size += p_len
+            overlap_paras.reverse()
 
             current_chunk = overlap_paras
             current_size = overlap_size
@@ -419,8 +514,13 @@ def _chunk_text_simple(text: str, target_chars: int = 4000, overlap_chars: int =
     return chunks
 
 
-def _build_chunk_records_for_doc(doc_id: str, base_metadata: dict, raw_text: str, lang: str) -> list[dict]:
-    clean_text = _decode_entities_and_normalize(raw_text)
+def _build_chunk_records_for_doc(doc_id: str, base_metadata: dict, clean_text: str, lang: str) -> list[dict]:
+    """_decode_entities_and_normalize를 거친 본문을 받아 청크 레코드 목록을 만든다.
+    기존과 같은 디코딩 깊이(정규화 2회)를 유지하되, "&"가 남아 있지 않으면 두 번째 정규화는 결과가 같으므로 생략한다.
+    """
+    if "&" in clean_text:
+        # 3단계 이상 이스케이프된 엔티티(예: &amp;amp;amp;) 추가 디코딩
+        clean_text = _decode_entities_and_normalize(clean_text)
     # 제목 접두사
     title = (base_metadata or {}).get("title") or ""
     prefix = (title + "\n\n") if title else ""
@@ -455,6 +555,65 @@ def _build_chunk_records_for_doc(doc_id: str, base_metadata: dict, raw_text: str
     # 빈 텍스트라면 최소 1건 생성 방지
     return out
 
+
+# WIPS 국가/언어 코드 → BCP 47 언어 태그
+_BCP47_BY_CODE = {
+    "KR": "ko", "KO": "ko",
+    "US": "en", "EN": "en",
+    "JP": "ja", "JA": "ja",
+    "CN": "zh", "ZH": "zh",
+}
+
+
+def _lang_to_bcp47(lang: str) -> str:
+    if not lang:
+        return "und"
+    code = lang.upper()
+    return _BCP47_BY_CODE.get(code) or code.lower()
+
+
+def _make_doc_id(ctry: str | None, publication_number: str | None, application_number: str | None, fallback: str) -> str:
+    c = (ctry or "").strip().upper()
+    pn = (publication_number or "").strip()
+    an = (application_number or "").strip()
+    if c and pn:
+        return f"{c}:{pn}"
+    if c and an:
+        return f"{c}:{an}"
+    return fallback
+
+
+def _normalize_chunk_schema(ch: dict) -> dict:
+    """청크 레코드 1건을 다운로드 스키마(chunk_id/language/chunk_index/...)로 정규화한다."""
+    if "id" in ch:
+        ch["chunk_id"] = ch.pop("id")
+    meta = ch.get("metadata", {}) or {}
+    lang_raw = meta.pop("lang", "")
+    ch["language"] = _lang_to_bcp47(lang_raw)
+    if "chunk_index" in meta:
+        ch["chunk_index"] = meta.pop("chunk_index")
+    if "chunk_total" in meta:
+        ch["chunk_total"] = meta.pop("chunk_total")
+    if "paragraph_range" in meta:
+        ch["paragraph_range"] = meta.pop("paragraph_range")
+    ch["section"] = "description"
+    try:
+        ch["token_count"] = len(_WORD_RE.findall(ch.get("text", "")))
+    except Exception:
+        ch["token_count"] = 0
+    return ch
+
+
+# docSummaryInfo li 내부 Key-Value 마크업 패턴
+_LI_DT_DD_RE = re.compile(r"<dt[^>]*>([\s\S]*?)</dt>\s*<dd[^>]*>([\s\S]*?)</dd>", re.IGNORECASE)
+_LI_TR_RE = re.compile(r"<tr[^>]*>([\s\S]*?)</tr>", re.IGNORECASE)
+_LI_CELL_RE = re.compile(r"<(?:th|td)[^>]*>([\s\S]*?)</(?:th|td)>", re.IGNORECASE)
+_LI_SPAN_PAIR_RE = re.compile(
+    r"<span[^>]*class=\"[^\"]*(?:tit|title|key)[^\"]*\"[^>]*>([\s\S]*?)</span>\s*<span[^>]*class=\"[^\"]*(?:cont|val|value|data)[^\"]*\"[^>]*>([\s\S]*?)</span>",
+    re.IGNORECASE,
+)
+
+
 def _extract_pairs_from_li_html(li_html: str) -> list[dict]:
     """docSummaryInfo > li:first-child 내부에서 보이는 Key-Value 쌍을 최대한 일반적으로 수집한다.
     다양한 마크업(dl/dt+dd, table th/td, span.title+span.value, 텍스트 콜론 구분)을 지원한다.
@@ -470,29 +629,34 @@ def _extract_pairs_from_li_html(li_html: str) -> list[dict]:
         if k and v:
             pairs.append({"label": k, "value": v})
 
+    # 태그 존재 여부를 먼저 확인해, 해당 마크업이 없는 패턴의 정규식 스캔은 건너뛴다
+    low = li_html.lower()
+
     # 1) dl/dt/dd 패턴
-    for m in re.findall(r"<dt[^>]*>([\s\S]*?)</dt>\s*<dd[^>]*>([\s\S]*?)</dd>", li_html, flags=re.IGNORECASE):
-        add_pair(m[0], m[1])
+    if "<dt" in low:
+        for m in _LI_DT_DD_RE.findall(li_html):
+            add_pair(m[0], m[1])
 
     # 2) table tr (th/td 또는 td/td)
-    for tr in re.findall(r"<tr[^>]*>([\s\S]*?)</tr>", li_html, flags=re.IGNORECASE):
-        cells = re.findall(r"<(?:th|td)[^>]*>([\s\S]*?)</(?:th|td)>", tr, flags=re.IGNORECASE)
-        if len(cells) >= 2:
-            key = cells[0]
-            val = " | ".join(cells[1:])
-            add_pair(key, val)
+    if "<tr" in low:
+        for tr in _LI_TR_RE.findall(li_html):
+            cells = _LI_CELL_RE.findall(tr)
+            if len(cells) >= 2:
+                key = cells[0]
+                val = " | ".join(cells[1:])
+                add_pair(key, val)
 
     # 3) span.title + span.value 형태(클래스명 유사 매칭)
-    for m in re.findall(
-        r"<span[^>]*class=\"[^\"]*(?:tit|title|key)[^\"]*\"[^>]*>([\s\S]*?)</span>\s*<span[^>]*class=\"[^\"]*(?:cont|val|value|data)[^\"]*\"[^>]*>([\s\S]*?)</span>",
-        li_html,
-        flags=re.IGNORECASE,
-    ):
-        add_pair(m[0], m[1])
+    if "<span" in low:
+        for m in _LI_SPAN_PAIR_RE.findall(li_html):
+            add_pair(m[0], m[1])
 
     # 4) 콜론/화살표 포함 텍스트 라인
     text_block = _strip_tags(li_html)
-    for raw_line in [x.strip() for x in text_block.split("\n") if x.strip()]:
+    for raw_line in text_block.split("\n"):
+        raw_line = raw_line.strip()
+        if not raw_line:
+            continue
         # 우선순위: -->, ->, →, :, ：
         if "-->" in raw_line:
             left, right = raw_line.split("-->", 1)
@@ -511,38 +675,47 @@ def _extract_pairs_from_li_html(li_html: str) -> list[dict]:
             left, right = raw_line.split(sep, 1)
             add_pair(left, right)
 
-    # 중복 제거(앞선 순서 우선)
-    seen = set()
-    deduped = []
+    # 중복 제거(앞선 순서 우선): (label, value) 키로 dict에 먼저 들어온 항목만 남긴다
+    deduped = {}
     for p in pairs:
-        key = (p["label"], p["value"])
-        if key in seen:
-            continue
-        seen.add(key)
-        deduped.append(p)
-    return deduped
+        deduped.setdefault((p["label"], p["value"]), p)
+    return list(deduped.values())
+
+
+# 날짜/목록 정규화 패턴
+_DATE_RE = re.compile(r"(\d{4})[.\-/](\d{2})[.\-/](\d{2})")
+_LIST_SEP_RE = re.compile(r"[;,/·ㆍ丨|]+")
 
 
 def _normalize_date(value: str) -> str:
     if not value:
         return ""
-    m = re.search(r"(\d{4})[.\-/](\d{2})[.\-/](\d{2})", value)
+    # 흔한 "YYYY.MM.DD" 단독 값은 정규식 없이 슬라이싱으로 바로 변환 (isdecimal은 \d와 같은 범위)
+    if (
+        len(value) == 10 and value[4] in ".-/" and value[7] in ".-/"
+        and value[:4].isdecimal() and value[5:7].isdecimal() and value[8:].isdecimal()
+    ):
+        return f"{value[:4]}-{value[5:7]}-{value[8:]}"
+    m = _DATE_RE.search(value)
     if m:
         return f"{m.group(1)}-{m.group(2)}-{m.group(3)}"
     return value.strip()
 
 
+# 영숫자가 아닌 문자 구간(공백·괄호·밑줄 포함) → "_" 1개
+_SLUG_SEP_RE = re.compile(r"[^a-z0-9]+")
+
+
 def _slugify_key(text: str) -> str:
-    t = re.sub(r"\s+", " ", text).strip().lower()
-    t = re.sub(r"[()\[\]{}]+", " ", t)
-    t = re.sub(r"[^a-z0-9]+", "_", t)
-    t = re.sub(r"_+", "_", t).strip("_")
+    # 공백/괄호/연속 "_"도 모두 비영숫자 구간에 포함되므로 치환 1회로 정리된다
+    t = _SLUG_SEP_RE.sub("_", text.lower()).strip("_")
     return t or "field"
 
 
-def _map_label_to_key(label: str) -> str | None:
-    base = re.sub(r"\s+", "", _strip_tags(label)).lower()
-    patterns = [
+# 라벨 → 표준 키 매핑 (위에서부터 먼저 매칭되는 키 사용)
+_LABEL_KEY_PATTERNS = tuple(
+    (re.compile(pat), key)
+    for pat, key in [
         (r"상태정보|status", "legal_status"),
         (r"최종처분|결정|등록결정|decision", "decision"),
         (r"등록번호|문헌번호|grantno|docnumber|documentnumber", "doc_number"),
@@ -557,8 +730,13 @@ def _map_label_to_key(label: str) -> str | None:
         (r"현재권리자|권리자|assignee", "assignees"),
         (r"출원히스토리|타임라인|history", "timeline"),
     ]
-    for pat, key in patterns:
-        if re.search(pat, base):
+)
+
+
+def _map_label_to_key(label: str) -> str | None:
+    base = "".join(_strip_tags(label).split()).lower()
+    for pat, key in _LABEL_KEY_PATTERNS:
+        if pat.search(base):
             return key
     return None
 
@@ -567,16 +745,9 @@ def _split_list_like(text: str) -> list[str]:
     if not text:
         return []
     raw = _strip_tags(text)
-    parts = [p.strip() for p in re.split(r"[;,/·ㆍ丨|]+", raw) if p.strip()]
+    parts = [p.strip() for p in _LIST_SEP_RE.split(raw) if p.strip()]
     # 중복 제거 순서보존
-    seen = set()
-    out = []
-    for p in parts:
-        if p in seen:
-            continue
-        seen.add(p)
-        out.append(p)
-    return out
+    return list(dict.fromkeys(parts))
 
 
 def structure_docsummary_pairs(pairs: list[dict]) -> dict:
@@ -607,7 +778,8 @@ def structure_docsummary_pairs(pairs: list[dict]) -> dict:
                 prev = fields[key]
                 if isinstance(prev, list):
                     prev = prev + (val if isinstance(val, list) else [val])
-                    fields[key] = [x for i, x in enumerate(prev) if x and x not in prev[:i]]
+                    # dict.fromkeys로 순서를 유지한 채 중복 제거(prev[:i] 슬라이스 비교는 O(n^2))
+                    fields[key] = [x for x in dict.fromkeys(prev) if x]
                 else:
                     fields[key] = [prev] + (val if isinstance(val, list) else [val])
             else:
@@ -618,28 +790,30 @@ def structure_docsummary_pairs(pairs: list[dict]) -> dict:
     return {"fields": fields, "by_label": by_label, "extras": extras}
 
 
+# 알려진 라벨 후보(빈도 순으로 배치)
+_SUMMARY_LABELS = [
+    "상태정보", "최종처분내용", "등록번호", "공고일", "공개번호", "관련특허", "출원번호",
+    "출원인", "원문상 출원인", "출원인 대표명", "출원인 대표명화", "현재권리자", "현재권리자 대표명",
+    "현재권리자 대표명화", "출원히스토리", "출원인 대표명칭"
+]
+# 라벨 정규식(라벨에 공백 허용) + 구분자
+_SUMMARY_LABEL_RE = re.compile(
+    r"((?:" + r"|".join([re.escape(l).replace("\\ ", "\\s*") for l in _SUMMARY_LABELS]) + r"))"
+    + r"\s*(?:-->|->|→|:|：)\s*"
+)
+
+
 def _extract_pairs_from_text_block(text: str) -> list[dict]:
     """라벨 토막들이 한 줄에 이어지는 형태를 전체 텍스트에서 안정적으로 분리한다.
     규칙: 알려진 라벨 + (--> | -> | → | : | ：) + 값, 다음 라벨이 나오기 전까지를 값으로 간주.
     """
     if not text:
         return []
-    raw = re.sub(r"\u00A0", " ", text)
-    raw = re.sub(r"\s+", " ", raw).strip()
-
-    # 알려진 라벨 후보(빈도 순으로 배치)
-    labels = [
-        "상태정보", "최종처분내용", "등록번호", "공고일", "공개번호", "관련특허", "출원번호",
-        "출원인", "원문상 출원인", "출원인 대표명", "출원인 대표명화", "현재권리자", "현재권리자 대표명",
-        "현재권리자 대표명화", "출원히스토리", "출원인 대표명칭"
-    ]
-    # 라벨 정규식(라벨에 공백 허용)
-    label_regex = r"(?:" + r"|".join([re.escape(l).replace("\\ ", "\\s*") for l in labels]) + r")"
-    delim = r"\s*(?:-->|->|→|:|：)\s*"
-    pattern = re.compile(rf"({label_regex}){delim}")
+    # str.split()은 NBSP(\u00A0)를 포함한 모든 공백으로 분리하므로 정규화 1회로 충분
+    raw = " ".join(text.split())
 
     pairs: list[dict] = []
-    matches = list(pattern.finditer(raw))
+    matches = list(_SUMMARY_LABEL_RE.finditer(raw))
     for i, m in enumerate(matches):
         start_val = m.end()
         end_val = matches[i + 1].start() if i + 1 < len(matches) else len(raw)
@@ -650,44 +824,24 @@ def _extract_pairs_from_text_block(text: str) -> list[dict]:
     return pairs
 
 
+_DOC_SUMMARY_UL_RE = re.compile(r"<ul[^>]*id\s*=\s*[\"']docSummaryInfo[\"'][^>]*>([\s\S]*?)</ul>", re.IGNORECASE)
+_FIRST_LI_RE = re.compile(r"<li[^>]*>([\s\S]*?)</li>", re.IGNORECASE)
+# 탭 JSON 직렬화 결과에 식별자가 있는지 확인용 (_DOC_SUMMARY_UL_RE와 같은 대소문자 처리)
+_DOC_SUMMARY_ID_RE = re.compile(r"docSummaryInfo", re.IGNORECASE)
+
+
 def fetch_wips_docsummary_first_li(target_url: str) -> dict:
     """상세보기 페이지에서 ul#docSummaryInfo 의 첫 번째 li 내용을 파싱해 반환한다.
     반환: { 'url': url, 'skey': skey, 'pairs': [...], 'raw_html': str }
     """
-    session = requests.Session()
-    session.verify = False
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124 Safari/537.36",
-        "Accept-Language": "ko,en;q=0.9",
-    }
-    r = session.get(target_url, headers=headers, timeout=20)
-    r.raise_for_status()
-    html = r.text
-
-    parsed = urlparse(target_url)
-    qs = parse_qs(parsed.query)
-    skey = qs.get("skey", [None])[0]
-    if not skey:
-        m = re.search(r'id="skey"\s+value="(\d+)"', html)
-        if m:
-            skey = m.group(1)
+    session, html, skey, ctry = _open_detail_page(target_url)
 
     # docSummaryInfo 영역 추출 → 첫 번째 li
     # 정적 HTML 시도(따옴표/공백 변형 허용)
-    m_ul = re.search(r"<ul[^>]*id\s*=\s*[\"']docSummaryInfo[\"'][^>]*>([\s\S]*?)</ul>", html, flags=re.IGNORECASE)
+    m_ul = _DOC_SUMMARY_UL_RE.search(html)
     if not m_ul:
         # 비동기 로드 폴백: docContJson.wips에서 탭별 HTML 검색
-        post_url = "https://sd.wips.co.kr/wipslink/doc/docContJson.wips"
-        ajax_headers = {
-            **headers,
-            "Referer": target_url,
-            "X-Requested-With": "XMLHttpRequest",
-            "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8; metatype=json",
-        }
-
-        # 국가 코드 시도(없어도 서버가 채움)
-        m_ctry = re.search(r'id=\"ctry\"\s+value=\"([A-Z]{2})\"', html)
-        ctry = m_ctry.group(1) if m_ctry else "WO"
+        ajax_headers = _ajax_headers(target_url)
 
         tab_candidates = ["OV", "AD", "DS", "CL", "AB", "PS", "JD", "FT"]
 
@@ -725,21 +879,23 @@ def fetch_wips_docsummary_first_li(target_url: str) -> dict:
                     "isJdEnable": "true",
                     "isFtEnable": "true",
                 }
-                j = session.post(post_url, headers=ajax_headers, data=data, timeout=30)
+                j = session.post(_DOC_CONT_URL, headers=ajax_headers, data=data, timeout=30)
                 j.raise_for_status()
                 payload = j.json()
                 html_candidate = pick_first_html_with_summary(payload)
                 if not html_candidate:
                     # JSON 전체 직렬화 후 유니코드 이스케이프를 해제하며 검색
-                    import json as _json
-                    blob = _json.dumps(payload, ensure_ascii=False)
+                    blob = json.dumps(payload, ensure_ascii=False)
+                    if not _DOC_SUMMARY_ID_RE.search(blob):
+                        # 식별자 자체가 없으면 이스케이프 해제/정규식 스캔 없이 다음 탭으로
+                        continue
                     try:
                         blob_unesc = bytes(blob, "utf-8").decode("unicode_escape")
                     except Exception:
                         blob_unesc = blob
                     html_candidate = blob_unesc
                 if html_candidate:
-                    mu = re.search(r"<ul[^>]*id\s*=\s*[\"']docSummaryInfo[\"'][^>]*>([\s\S]*?)</ul>", html_candidate, flags=re.IGNORECASE)
+                    mu = _DOC_SUMMARY_UL_RE.search(html_candidate)
                     if mu:
                         m_ul = mu
                         ul_html = mu.group(1)
@@ -752,7 +908,7 @@ def fetch_wips_docsummary_first_li(target_url: str) -> dict:
 
     if 'ul_html' not in locals() or ul_html is None:
         ul_html = m_ul.group(1)
-    m_li = re.search(r'<li[^>]*>([\s\S]*?)</li>', ul_html, flags=re.IGNORECASE)
+    m_li = _FIRST_LI_RE.search(ul_html)
     if not m_li:
         raise RuntimeError("docSummaryInfo 내 첫 번째 li를 찾을 수 없습니다.")
     li_html = m_li.group(1)
@@ -784,7 +940,7 @@ def fetch_docsummary_with_browser(target_url: str, wait_ms: int = 8000) -> dict:
 
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=True)
-        context = browser.new_context(user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124 Safari/537.36")
+        context = browser.new_context(user_agent=_BROWSER_HEADERS["User-Agent"])
         page = context.new_page()
         page.set_default_timeout(max(wait_ms, 3000))
         page.goto(target_url, wait_until="domcontentloaded")
@@ -880,6 +1036,131 @@ def fetch_docsummary_with_browser(target_url: str, wait_ms: int = 8000) -> dict:
     return {"url": target_url, "skey": qs.get("skey", [None])[0], "pairs": pairs, "structured": structured, "raw_html": li_html}
 
 
+def _read_excel_rows(uploaded) -> tuple[list[tuple[int, int, dict]], dict[int, str], int]:
+    """업로드된 엑셀에서 (행 데이터 목록, 행→WIPS URL, 전체 행 수)를 읽는다.
+    rows는 빈 행을 제외한 (진행 순번, 엑셀 행 번호, 헤더명→값) 목록이다.
+    워크북/셀 객체는 이 함수의 지역 변수로만 참조되므로, 반환 후에는 (순환 참조 회수 시) 해제될 수 있다.
+    """
+    wb = load_workbook(filename=uploaded, data_only=False, read_only=False)
+    ws = wb.active
+
+    # '출원번호' 헤더 탐색(링크 보관 열)
+    target_col_idx = None
+    header_row_idx = None
+    matched_header_value = None
+    search_rows = min(ws.max_row, 50)
+    candidates = []
+    for r in range(1, search_rows + 1):
+        row_values = [normalize_header(c.value) for c in ws[r]]
+        for c_idx, v in enumerate(row_values, start=1):
+            if not v:
+                continue
+            if v == "출원번호":
+                target_col_idx = c_idx
+                header_row_idx = r
+                matched_header_value = v
+                break
+            if "출원번호" in v:
+                candidates.append((c_idx, r, v))
+        if target_col_idx is not None:
+            break
+    if target_col_idx is None and candidates:
+        target_col_idx, header_row_idx, matched_header_value = candidates[0]
+    if target_col_idx is None:
+        raise RuntimeError("'출원번호' 헤더를 찾지 못했습니다. 엑셀의 링크 열을 '출원번호'로 지정해주세요.")
+
+    # 헤더 맵 구성
+    headers = {}
+    for col_idx, cell in enumerate(ws[header_row_idx], start=1):
+        h = normalize_header(cell.value)
+        if h:
+            headers[col_idx] = h
+
+    # 행→URL 매핑
+    row_to_url = {}
+    for r in range(header_row_idx + 1, ws.max_row + 1):
+        cell = ws.cell(row=r, column=target_col_idx)
+        url, source = extract_url_from_cell(cell)
+        if url and "sd.wips.co.kr" in url:
+            row_to_url[r] = url.strip()
+
+    total_rows = max(ws.max_row - header_row_idx, 1)
+
+    # 행 데이터 수집(빈 행 제외)
+    rows: list[tuple[int, int, dict]] = []
+    for idx, r in enumerate(range(header_row_idx + 1, ws.max_row + 1), start=1):
+        row_data = {}
+        for col_idx, header_name in headers.items():
+            cell = ws.cell(row=r, column=col_idx)
+            value = cell.value
+            if header_name in ["출원일", "공개일", "등록일"]:
+                if isinstance(value, date):
+                    # 날짜 서식 셀은 openpyxl이 datetime으로 주므로 문자열화+정규식 없이 바로 포맷
+                    value = f"{value.year:04d}-{value.month:02d}-{value.day:02d}"
+                else:
+                    value = _normalize_date(str(value)) if value else ""
+            elif value is not None:
+                value = str(value).strip()
+            else:
+                value = ""
+            row_data[header_name] = value
+
+        if any(v for v in row_data.values()):
+            rows.append((idx, r, row_data))
+
+    # 필요한 셀 값은 모두 rows로 옮겼다. 반환 후에는 ws/cell 등 워크북을 가리키는 참조가 남지 않는다
+    wb.close()
+    return rows, row_to_url, total_rows
+
+
+# 원문 동시 수집 스레드 수 (WIPS 서버 부하를 고려해 작게 유지)
+_FETCH_MAX_WORKERS = 4
+
+
+def _fetch_preferred_description(url: str) -> tuple[str, str, str]:
+    """URL 1건의 발명의 설명을 수집해 (우선 언어 본문 텍스트, 언어 코드, 국가 코드)를 반환한다.
+    수집 실패 시 빈 값을 반환한다(작업 스레드에서 호출되므로 예외를 밖으로 던지지 않음).
+    """
+    try:
+        desc_out = fetch_wips_description(url)
+        by_lang = desc_out.get("descriptions_by_lang", {})
+        selected_text, selected_lang = _select_preferred_lang_text(by_lang)
+        ctry = (desc_out.get("doc", {}) or {}).get("ctry", "")
+    except Exception:
+        return "", "", ""
+    return selected_text, selected_lang, ctry
+
+
+# JSON 직렬화기 (호출마다 인코더를 새로 만들지 않도록 재사용)
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False)
+
+
+def _make_json_shards(records: list[dict], max_bytes: int = 10 * 1024 * 1024) -> list[bytes]:
+    """레코드를 max_bytes 이하의 JSON 배열(UTF-8 바이트)들로 나눈다.
+    레코드당 1회만 직렬화·인코딩하고, 크기 계산에 쓴 바이트를 그대로 이어 붙여 배열을 만든다.
+    """
+    shards: list[bytes] = []
+    current: list[bytes] = []
+    current_bytes = 2
+    for rec in records:
+        try:
+            rec_bytes = _JSON_ENCODER.encode(rec).encode("utf-8")
+        except Exception:
+            continue
+        rec_size = len(rec_bytes)
+        sep = 1 if current else 0
+        if current and (current_bytes + rec_size + sep) > max_bytes:
+            shards.append(b"[" + b", ".join(current) + b"]")
+            current = []
+            current_bytes = 2
+            sep = 0
+        current.append(rec_bytes)
+        current_bytes += rec_size + sep
+    if current:
+        shards.append(b"[" + b", ".join(current) + b"]")
+    return shards
+
+
 # ===== 단일 페이지: 엑셀 업로드 → 자동 파이프라인 → 미리보기/다운로드 =====
 st.header("엑셀 업로드 → 자동 처리")
 
@@ -890,6 +1171,10 @@ if "chunks_records" not in st.session_state:
     st.session_state.chunks_records = []
 if "uploaded_file_id" not in st.session_state:
     st.session_state.uploaded_file_id = None
+if "description_cache" not in st.session_state:
+    # URL → (본문 텍스트, 언어 코드, 국가 코드). 현재 업로드 파일의 처리가 중단/재실행될 때만 재사용하며,
+    # 새 파일이 올라오거나 처리가 완료되면 비운다(결과는 chunks_records에 이미 있음)
+    st.session_state.description_cache = {}
 
 uploaded = st.file_uploader("특허 엑셀 파일(.xlsx) 업로드", type=["xlsx"], accept_multiple_files=False, key="single_flow_uploader")
 
@@ -899,6 +1184,7 @@ if uploaded is not None:
     if st.session_state.uploaded_file_id != current_file_id:
         st.session_state.processing_complete = False
         st.session_state.chunks_records = []
+        st.session_state.description_cache = {}
         st.session_state.uploaded_file_id = current_file_id
 
 # 이미 처리가 완료된 경우 결과만 표시
@@ -930,36 +1216,13 @@ if uploaded is not None and st.session_state.processing_complete:
             with st.expander(label, expanded=(i==0)):
                 st.json(chunks_records[i], expanded=False)
 
-    # JSON 배열(샤딩) 다운로드
-    def _make_json_shards(records: list[dict], max_bytes: int = 10 * 1024 * 1024) -> list[str]:
-        import json as _json
-        shards: list[str] = []
-        current: list[dict] = []
-        current_bytes = 2
-        for rec in records:
-            try:
-                rec_str = _json.dumps(rec, ensure_ascii=False)
-            except Exception:
-                continue
-            rec_size = len(rec_str.encode("utf-8"))
-            sep = 1 if current else 0
-            if current and (current_bytes + rec_size + sep) > max_bytes:
-                shards.append(_json.dumps(current, ensure_ascii=False))
-                current = []
-                current_bytes = 2
-                sep = 0
-            current.append(rec)
-            current_bytes += rec_size + sep
-        if current:
-            shards.append(_json.dumps(current, ensure_ascii=False))
-        return shards
-
+    # JSON 배열(샤딩) 다운로드: 샤드는 이미 UTF-8 바이트이므로 ZIP/개별 버튼에서 그대로 재사용
     chunks_shards = _make_json_shards(chunks_records)
 
     if len(chunks_shards) == 1:
         st.download_button(
             label=f"📥 chunks.json 다운로드 ({len(chunks_records)}개 청크)",
-            data=chunks_shards[0].encode("utf-8"),
+            data=chunks_shards[0],
             file_name="patents.chunks.json",
             mime="application/json",
             type="primary",
@@ -972,7 +1235,7 @@ if uploaded is not None and st.session_state.processing_complete:
         with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
             for i, shard in enumerate(chunks_shards, start=1):
                 file_name = f"patents.chunks.part-{i:03d}.json"
-                zip_file.writestr(file_name, shard.encode("utf-8"))
+                zip_file.writestr(file_name, shard)
 
         zip_buffer.seek(0)
         st.download_button(
@@ -993,7 +1256,7 @@ if uploaded is not None and st.session_state.processing_complete:
             with cols[col_idx]:
                 st.download_button(
                     label=f"📥 Part {i}/{len(chunks_shards)}",
-                    data=shard.encode("utf-8"),
+                    data=shard,
                     file_name=f"patents.chunks.part-{i:03d}.json",
                     mime="application/json",
                     key=f"download_part_{i}",
@@ -1008,166 +1271,92 @@ if uploaded is not None and not st.session_state.processing_complete:
         try:
             # 1) 파일 로드
             st.write("1) 파일 로드")
-            data = uploaded.read()
+            # UploadedFile은 이미 메모리 버퍼(BytesIO)이므로 복사 없이 처음 위치로만 되돌려 그대로 사용
+            uploaded.seek(0)
             progress.progress(5)
 
             # 2) 엑셀 파싱 및 메타데이터 수집
             st.write("2) 엑셀 파싱 및 메타데이터 수집")
-            wb = load_workbook(filename=BytesIO(data), data_only=False, read_only=False)
-            ws = wb.active
+            rows, row_to_url, total_rows = _read_excel_rows(uploaded)
+            # openpyxl 워크북은 시트↔워크북 순환 참조라 참조 카운트만으로는 해제되지 않으므로 수집 전에 바로 회수
+            gc.collect()
             progress.progress(20)
 
-            # '출원번호' 헤더 탐색(링크 보관 열)
-            target_col_idx = None
-            header_row_idx = None
-            matched_header_value = None
-            search_rows = min(ws.max_row, 50)
-            candidates = []
-            for r in range(1, search_rows + 1):
-                row_values = [normalize_header(c.value) for c in ws[r]]
-                for c_idx, v in enumerate(row_values, start=1):
-                    if not v:
-                        continue
-                    if v == "출원번호":
-                        target_col_idx = c_idx
-                        header_row_idx = r
-                        matched_header_value = v
-                        break
-                    if "출원번호" in v:
-                        candidates.append((c_idx, r, v))
-                if target_col_idx is not None:
-                    break
-            if target_col_idx is None and candidates:
-                target_col_idx, header_row_idx, matched_header_value = candidates[0]
-            if target_col_idx is None:
-                raise RuntimeError("'출원번호' 헤더를 찾지 못했습니다. 엑셀의 링크 열을 '출원번호'로 지정해주세요.")
-
-            # 헤더 맵 구성
-            headers = {}
-            for col_idx, cell in enumerate(ws[header_row_idx], start=1):
-                h = normalize_header(cell.value)
-                if h:
-                    headers[col_idx] = h
-
-            # 행→URL 매핑
-            row_to_url = {}
-            for r in range(header_row_idx + 1, ws.max_row + 1):
-                cell = ws.cell(row=r, column=target_col_idx)
-                url, source = extract_url_from_cell(cell)
-                if url and "sd.wips.co.kr" in url:
-                    row_to_url[r] = url.strip()
-
             # 3) 원문 수집 및 RAG 청크 생성
             st.write("3) 특허 원문 수집 및 RAG 청크 생성")
             progress.progress(40)
-            total_rows = max(ws.max_row - header_row_idx, 1)
             step_bar = st.progress(0, text="수집 진행률")
 
-            def _lang_to_bcp47_inline(lang: str) -> str:
-                if not lang:
-                    return "und"
-                code = lang.upper()
-                if code in {"KR", "KO"}:
-                    return "ko"
-                if code in {"US", "EN"}:
-                    return "en"
-                if code in {"JP", "JA"}:
-                    return "ja"
-                if code in {"CN", "ZH"}:
-                    return "zh"
-                return code.lower()
-
-            def _make_doc_id_inline(ctry: str | None, publication_number: str | None, application_number: str | None, fallback: str) -> str:
-                c = (ctry or "").strip().upper()
-                pn = (publication_number or "").strip()
-                an = (application_number or "").strip()
-                if c and pn:
-                    return f"{c}:{pn}"
-                if c and an:
-                    return f"{c}:{an}"
-                return fallback
-
             chunks_records: list[dict] = []
 
-            for idx, r in enumerate(range(header_row_idx + 1, ws.max_row + 1), start=1):
-                row_data = {}
-                for col_idx, header_name in headers.items():
-                    cell = ws.cell(row=r, column=col_idx)
-                    value = cell.value
-                    if header_name in ["출원일", "공개일", "등록일"]:
-                        value = _normalize_date(str(value)) if value else ""
-                    elif value is not None:
-                        value = str(value).strip()
+            # 원문 수집은 네트워크 대기 위주이므로 스레드 풀로 동시에 요청하고, 결과는 행 순서대로 소비
+            # 같은 파일의 이전(중단된) 실행에서 이미 수집한 URL은 캐시를 쓰고, 나머지는 고유 URL당 1번만 요청한다
+            desc_cache = st.session_state.description_cache
+            # with 블록 대신 직접 종료한다: st.stop/rerun(BaseException)이나 오류로 빠져나갈 때
+            # 대기 중인 요청은 취소하고, 진행 중인 요청이 끝나기를 기다리지 않는다
+            worker_sessions: list[requests.Session] = []
+            executor = ThreadPoolExecutor(
+                max_workers=_FETCH_MAX_WORKERS, initializer=_init_fetch_worker, initargs=(worker_sessions,)
+            )
+            try:
+                futures = {}
+                for _, r, _ in rows:
+                    url = row_to_url.get(r)
+                    if url and url not in desc_cache and url not in futures:
+                        futures[url] = executor.submit(_fetch_preferred_description, url)
+                for idx, r, row_data in rows:
+                    url = row_to_url.get(r)
+                    publication_number = row_data.get("공개번호", "")
+                    application_number = row_data.get("출원번호", "")
+                    title = row_data.get("발명의 명칭", "")
+
+                    if url in desc_cache:
+                        selected_text, selected_lang, ctry = desc_cache[url]
+                    elif url in futures:
+                        selected_text, selected_lang, ctry = futures[url].result()
+                        # 실패(빈 본문)는 캐시하지 않아 다음 실행에서 다시 시도되도록 한다
+                        if selected_text:
+                            desc_cache[url] = (selected_text, selected_lang, ctry)
                     else:
-                        value = ""
-                    row_data[header_name] = value
+                        selected_text, selected_lang, ctry = "", "", ""
+
+                    doc_id_raw = application_number or publication_number or f"row_{r}"
+                    doc_id = _make_doc_id(ctry, publication_number, application_number, doc_id_raw)
+                    processed_text = _decode_entities_and_normalize(selected_text)
+
+                    # 청크(chunks.json)
+                    if processed_text:
+                        base_meta_for_chunk = {
+                            "jurisdiction": (ctry or "").upper() or None,
+                            "publication_number": publication_number,
+                            "application_number": application_number,
+                            "registration_number": row_data.get("등록번호", ""),
+                            "filing_date": row_data.get("출원일", ""),
+                            "publication_date": row_data.get("공개일", ""),
+                            "registration_date": row_data.get("등록일", ""),
+                            "assignees": [row_data.get("출원인", "")] if row_data.get("출원인") else [],
+                            "title": title,
+                            "legal_status": row_data.get("상태정보", ""),
+                            "wips_url": url or "",
+                        }
+                        chunks = _build_chunk_records_for_doc(doc_id, base_meta_for_chunk, processed_text, selected_lang)
+                        # 스키마 정규화
+                        chunks_records.extend(_normalize_chunk_schema(ch) for ch in chunks)
 
-                if not any(v for v in row_data.values()):
                     step_bar.progress(min(int(100 * idx / total_rows), 100))
-                    continue
-
-                url = row_to_url.get(r)
-                selected_text = ""
-                selected_lang = ""
-                ctry = ""
-                publication_number = row_data.get("공개번호", "")
-                application_number = row_data.get("출원번호", "")
-                title = row_data.get("발명의 명칭", "")
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+                # 워커 세션의 keep-alive 연결을 GC에 맡기지 않고 바로 닫는다
+                for session in worker_sessions:
+                    session.close()
 
-                if url:
-                    try:
-                        desc_out = fetch_wips_description(url)
-                        by_lang = desc_out.get("descriptions_by_lang", {})
-                        selected_text, selected_lang = _select_preferred_lang_text(by_lang)
-                        ctry = (desc_out.get("doc", {}) or {}).get("ctry", "")
-                    except Exception:
-                        selected_text, selected_lang = "", ""
-
-                doc_id_raw = application_number or publication_number or f"row_{r}"
-                doc_id = _make_doc_id_inline(ctry, publication_number, application_number, doc_id_raw)
-                processed_text = _decode_entities_and_normalize(selected_text)
-
-                # 청크(chunks.json)
-                if processed_text:
-                    base_meta_for_chunk = {
-                        "jurisdiction": (ctry or "").upper() or None,
-                        "publication_number": publication_number,
-                        "application_number": application_number,
-                        "registration_number": row_data.get("등록번호", ""),
-                        "filing_date": row_data.get("출원일", ""),
-                        "publication_date": row_data.get("공개일", ""),
-                        "registration_date": row_data.get("등록일", ""),
-                        "assignees": [row_data.get("출원인", "")] if row_data.get("출원인") else [],
-                        "title": title,
-                        "legal_status": row_data.get("상태정보", ""),
-                        "wips_url": url or "",
-                    }
-                    chunks = _build_chunk_records_for_doc(doc_id, base_meta_for_chunk, processed_text, selected_lang)
-                    # 스키마 정규화
-                    for ch in chunks:
-                        if "id" in ch:
-                            ch["chunk_id"] = ch.pop("id")
-                        meta = ch.get("metadata", {}) or {}
-                        lang_raw = meta.pop("lang", "")
-                        ch["language"] = _lang_to_bcp47_inline(lang_raw)
-                        if "chunk_index" in meta:
-                            ch["chunk_index"] = meta.pop("chunk_index")
-                        if "chunk_total" in meta:
-                            ch["chunk_total"] = meta.pop("chunk_total")
-                        if "paragraph_range" in meta:
-                            ch["paragraph_range"] = meta.pop("paragraph_range")
-                        ch["section"] = "description"
-                        try:
-                            ch["token_count"] = len(re.findall(r"\w+", ch.get("text", "")))
-                        except Exception:
-                            ch["token_count"] = 0
-                    chunks_records.extend(chunks)
-
-                step_bar.progress(min(int(100 * idx / total_rows), 100))
+            step_bar.progress(100)
 
             # 결과를 session_state에 저장
             st.session_state.chunks_records = chunks_records
             st.session_state.processing_complete = True
+            # 본문 텍스트를 청크와 이중으로 보관하지 않도록 캐시 해제
+            st.session_state.description_cache = {}
 
             progress.progress(100)
             status.update(label="처리 완료", state="complete")